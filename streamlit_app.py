@@ -1,7 +1,14 @@
+import functools
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
-import random
-from collections import Counter, defaultdict
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 # Probability mapping if your Faction file uses "High/Moderate/Low"
 PROB_MAP = {
@@ -11,11 +18,443 @@ PROB_MAP = {
     "None": 0.0
 }
 
-def parse_faction_list(cell_value):
-    """Parse a comma-separated list of faction names from the cell."""
-    if pd.isna(cell_value) or str(cell_value).strip() == "":
-        return []
-    return [x.strip() for x in str(cell_value).split(",") if x.strip()]
+# Edge rows shown on screen; only these rows are ever turned into a DataFrame
+PREVIEW_ROWS = 500
+
+# Rows per chunk when writing the edges CSV / Parquet, and their columns
+CSV_CHUNK_ROWS = 100_000
+# Decimal places for probabilities in the CSV (Parquet keeps full float32)
+CSV_DECIMALS = 4
+EDGE_SCHEMA = pa.schema([
+    ("source", pa.string()),
+    ("target", pa.string()),
+    ("p_celeb", pa.float32()),
+    ("p_faction_raw", pa.float32()),
+    ("p_faction_scaled", pa.float32()),
+    ("p_final", pa.float32())
+])
+
+# Probabilities per tile when drawing edges (~1 MB of float32, so a tile's
+# probabilities, uniforms and mask stay cache-resident)
+DRAW_TILE_CELLS = 1 << 18
+
+# Threads drawing edges in parallel
+DRAW_WORKERS = min(8, os.cpu_count() or 1)
+
+# Cross-faction columns and the probability they give, in increasing
+# precedence: "never" beats "High" beats "Moderate"; unmentioned => 0.
+FOLLOW_COLUMNS = (
+    ("Factions who may Follow", 0.5),
+    ("Factions Following", 0.9),
+    ("Factions who’ll never Follow", 0.0)
+)
+
+def column_or_default(df, col, default):
+    """Return df[col], or a Series filled with `default` if the column is missing."""
+    if col in df.columns:
+        return df[col]
+    return pd.Series(default, index=df.index)
+
+def follower_matrix(cells, faction_list):
+    """Return an (F x F) bool matrix whose [a, b] entry is set when faction b's cell lists faction a.
+
+    `cells` holds one comma-separated list of faction names per faction
+    row, indexed by that row's faction name. Names that aren't factions
+    are dropped.
+    """
+    dummies = (cells.astype("string").fillna("")
+               .str.replace(r"\s*,\s*", ",", regex=True).str.strip()
+               .str.get_dummies(sep=","))
+    dummies.index = cells.index
+    return dummies.T.reindex(index=faction_list, columns=faction_list, fill_value=0).to_numpy(dtype=bool)
+
+# ------------------------------
+# Cached loading + probability model
+# Streamlit reruns main() on every widget change; everything below only
+# depends on the uploaded file bytes (and the sliders), so memoize it.
+# ------------------------------
+@st.cache_data
+def read_excel_bytes(file_bytes):
+    """Read an uploaded Excel file (as raw bytes) into a DataFrame."""
+    return pd.read_excel(io.BytesIO(file_bytes))
+
+@st.cache_data
+def load_factions(faction_bytes):
+    """Parse the Factions file.
+
+    Returns (faction_list, ignored, base_mat): the faction names, whether
+    each one has Ignore=1, and the (F x F) 'base' probability that
+    faction i follows faction j, ignoring large-faction scaling.
+    """
+    df_factions = read_excel_bytes(faction_bytes)
+    df_factions.index = df_factions["Faction"].astype(str).str.strip()
+    # A faction listed twice keeps its last row
+    df_factions = df_factions[~df_factions.index.duplicated(keep="last")]
+    faction_list = df_factions.index.tolist()
+
+    ignored = column_or_default(df_factions, "Ignore", 0).eq(1).fillna(False).to_numpy(dtype=bool)
+
+    # Cross-faction: later columns overwrite earlier ones
+    base_mat = np.zeros((len(faction_list), len(faction_list)), dtype=np.float32)
+    for col, prob in FOLLOW_COLUMNS:
+        follows = follower_matrix(column_or_default(df_factions, col, None), faction_list)
+        base_mat[follows] = prob
+
+    # Intra-faction
+    intra = (column_or_default(df_factions, "IntraFaction Following", "None")
+             .astype(str).str.strip().map(PROB_MAP).fillna(0.0).to_numpy(dtype=np.float32))
+    np.fill_diagonal(base_mat, intra)
+
+    return faction_list, ignored, base_mat
+
+@st.cache_data
+def load_personas(persona_bytes, faction_bytes):
+    """Parse the Personas file into parallel (handles, names, factions, tw) arrays.
+
+    Personas whose faction is ignored or not in the Factions file are dropped.
+    """
+    df_personas = read_excel_bytes(persona_bytes)
+    faction_list, ignored, _ = load_factions(faction_bytes)
+
+    # skip if faction is ignored or not found (before touching other columns)
+    factions = df_personas["Faction"].astype(str).str.strip()
+    active_factions = [f for f, ign in zip(faction_list, ignored) if not ign]
+    keep = factions.isin(active_factions).to_numpy(dtype=bool)
+    df_personas = df_personas[keep]
+
+    factions = factions[keep].to_numpy()
+    handles  = df_personas["Handle"].astype(str).str.strip().to_numpy()
+    names    = (df_personas["Name"].astype(str).to_numpy()
+                if "Name" in df_personas.columns else handles.copy())
+    # Blank TwFollowers count as 0, same as a missing column
+    tw       = column_or_default(df_personas, "TwFollowers", 0).to_numpy(dtype=np.float64, na_value=0.0)
+
+    return handles, names, factions, tw
+
+@st.cache_data
+def build_faction_model(faction_bytes, persona_bytes):
+    """Compute the slider-independent part of the model.
+
+    Returns (base_mat, fac_ids, sizes, tw_ratio) where base_mat is the
+    (F x F) faction->faction probability, fac_ids and sizes give each
+    persona's faction and each faction's size, and tw_ratio is
+    TwFollowers / max(TwFollowers). Everything is float32: the
+    probabilities don't need double precision and the N x N arrays built
+    from these take half the memory.
+    """
+    faction_list, _, base_mat = load_factions(faction_bytes)
+    handles, names, factions, tw = load_personas(persona_bytes, faction_bytes)
+
+    # max TwFollowers
+    max_tw = tw.max() or 1.0
+    tw_ratio = (tw / max_tw).astype(np.float32)
+
+    # Per-persona faction ids (categorical codes, the smallest int type that
+    # fits F), and how large each faction is
+    fac_ids = pd.Categorical(factions, categories=faction_list).codes
+    sizes = np.bincount(fac_ids, minlength=len(faction_list)).astype(np.float32)
+
+    return base_mat, fac_ids, sizes, tw_ratio
+
+def edge_model(faction_bytes, persona_bytes, alpha, exponent):
+    """Apply the sliders to the faction model.
+
+    Returns a dict of the small per-persona / per-faction arrays every
+    edge probability is built from:
+      - "base_mat": (F x F) raw faction->faction probability
+      - "scaled_mat": base_mat with row a divided by size(a)**beta
+      - "fac_ids", "sizes": each persona's faction, each faction's size
+      - "fac_scale": size(f)**beta, the large-faction divisor
+      - "p_celeb": celebrity probability of following each persona
+    (size**0 == 1**beta == 1, so no special cases are needed.)
+    """
+    base_mat, fac_ids, sizes, tw_ratio = build_faction_model(faction_bytes, persona_bytes)
+    # Factions without personas never get gathered; keep their divisor at 1
+    fac_scale = np.maximum(sizes, 1) ** exponent
+    return {
+        "base_mat": base_mat,
+        "scaled_mat": base_mat / fac_scale[:, None],
+        "fac_ids": fac_ids,
+        "sizes": sizes,
+        "fac_scale": fac_scale,
+        "p_celeb": alpha * tw_ratio
+    }
+
+def final_probs(model, s, t):
+    """Return p_final for source/target persona indices s, t (which broadcast).
+
+    Scaling is already folded into the (F x F) scaled_mat, so this is one
+    gather plus in-place arithmetic on a single output array. It is
+    branch-free on purpose: a zero faction prob ("never" or unmentioned)
+    still leaves the celebrity prob, so there is no base > 0 mask to
+    apply. The only forced zeros are self-follows, which callers exclude.
+    """
+    fac_ids = model["fac_ids"]
+    # 2) + 3) Scaled faction prob
+    p = model["scaled_mat"][fac_ids[s], fac_ids[t]]
+    # 4) Union with 1) the celebrity prob of B: 1 - (1 - p_celeb)(1 - p)
+    np.subtract(1, p, out=p)
+    p *= 1 - model["p_celeb"][t]
+    np.subtract(1, p, out=p)
+    return p
+
+def edge_probs(model, s, t):
+    """Return (p_faction_raw, p_faction_scaled, p_final) for a list of edges."""
+    fa, fb = model["fac_ids"][s], model["fac_ids"][t]
+    return model["base_mat"][fa, fb], model["scaled_mat"][fa, fb], final_probs(model, s, t)
+
+def expected_in_degree(model):
+    """Return the column sums of p_final without building the N x N matrix.
+
+    For target B with celebrity prob c and scaled faction probs f(A, B):
+        sum over A != B of 1 - (1 - c)(1 - f(A, B))
+            = (N - 1) c + (1 - c) (sum over all A of f(A, B) - f(B, B))
+    and f(A, B) only depends on A's faction, so the inner sum is
+    sum over factions a of size(a) * scaled_mat[a, B's faction].
+    """
+    fac_ids = model["fac_ids"]
+    N = len(fac_ids)
+
+    faction_sum = model["sizes"].astype(np.float64) @ model["scaled_mat"]
+    self_term = np.diag(model["scaled_mat"])[fac_ids]
+
+    c = model["p_celeb"].astype(np.float64)
+    return (N - 1) * c + (1 - c) * (faction_sum[fac_ids] - self_term)
+
+def degree_table(handles, names, factions, col, degrees):
+    """Build the per-persona table for one degree column, highest first."""
+    return pd.DataFrame({
+        "handle": handles,
+        "name": names,
+        "faction": factions,
+        col: degrees
+    }).sort_values(col, ascending=False)
+
+def offdiag_pairs(start, stop, N):
+    """Return (source, target) persona indices for flat edge positions [start, stop).
+
+    Edges are numbered row-major over all ordered pairs with the self-follow
+    skipped, so row i holds N - 1 edges and target j' maps to j' + (j' >= i).
+    """
+    k = np.arange(start, stop)
+    s, t = np.divmod(k, max(N - 1, 1))
+    t += t >= s
+    return s, t
+
+def edge_possible(model, s, t):
+    """Return True for (source, target) pairs with any chance of an edge.
+
+    Those are the non-self pairs where the target has celebrity pull or the
+    two factions have a positive scaled faction prob; the rest are the
+    zero-probability edges the app can hide.
+    """
+    fac_ids = model["fac_ids"]
+    return (s != t) & ((model["p_celeb"][t] > 0) | (model["scaled_mat"][fac_ids[s], fac_ids[t]] > 0))
+
+def row_edge_counts(model):
+    """Return, per source persona, how many targets edge_possible keeps."""
+    fac_ids, sizes = model["fac_ids"], model["sizes"]
+    links = model["scaled_mat"] > 0
+    celeb = model["p_celeb"] > 0
+    # A follower in faction a reaches all of faction b through a faction
+    # link, otherwise only b's celebrities
+    celeb_sizes = np.bincount(fac_ids, weights=celeb, minlength=len(sizes))
+    per_faction = np.where(links, sizes, celeb_sizes).sum(axis=1)
+    # Each persona is counted among its own faction's targets; drop it
+    return per_faction[fac_ids].astype(np.int64) - (np.diag(links)[fac_ids] | celeb)
+
+def nonzero_pairs(model, start, stop):
+    """Like offdiag_pairs, but numbering only the pairs edge_possible keeps."""
+    N = len(model["fac_ids"])
+    counts = row_edge_counts(model)
+    ends = np.cumsum(counts)
+    # Only the rows holding edges [start, stop) are scanned, a tile of
+    # DRAW_TILE_CELLS at a time, so a page costs O(page + N) memory
+    first = np.searchsorted(ends, start, side="right")
+    last = np.searchsorted(ends, stop, side="left")
+    rows = first + np.flatnonzero(counts[first:last + 1])
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    targets = np.arange(N)
+    rows_per_tile = max(1, DRAW_TILE_CELLS // N)
+    src, tgt = [], []
+    for i in range(0, len(rows), rows_per_tile):
+        tile_rows = rows[i:i + rows_per_tile]
+        s, t = np.nonzero(edge_possible(model, tile_rows[:, None], targets[None, :]))
+        src.append(tile_rows[s])
+        tgt.append(t)
+    s, t = np.concatenate(src), np.concatenate(tgt)
+    skip = start - (ends[rows[0]] - counts[rows[0]])
+    return s[skip:skip + stop - start], t[skip:skip + stop - start]
+
+def edge_columns(model, handles, s, t):
+    """Return the edge columns for the given (source, target) persona indices."""
+    p_faction_raw, p_faction_scaled, p_final = edge_probs(model, s, t)
+    return {
+        "source": handles[s],
+        "target": handles[t],
+        "p_celeb": model["p_celeb"][t],
+        "p_faction_raw": p_faction_raw,  # just for debugging
+        "p_faction_scaled": p_faction_scaled,
+        "p_final": p_final
+    }
+
+def edges_frame(model, handles, s, t):
+    """Build an edges DataFrame for the given (source, target) persona indices."""
+    return pd.DataFrame(edge_columns(model, handles, s, t))
+
+def edge_tables(model, handles, hide_zero=False):
+    """Yield every edge as Arrow tables of up to CSV_CHUNK_ROWS rows each.
+
+    With hide_zero, pairs edge_possible rules out are dropped from each chunk.
+    """
+    N = len(handles)
+    n_pairs = N * (N - 1)
+    for start in range(0, n_pairs, CSV_CHUNK_ROWS):
+        stop = min(start + CSV_CHUNK_ROWS, n_pairs)
+        s, t = offdiag_pairs(start, stop, N)
+        if hide_zero:
+            keep = edge_possible(model, s, t)
+            s, t = s[keep], t[keep]
+        cols = edge_columns(model, handles, s, t)
+        yield pa.table(
+            [pa.array(cols[f.name], type=f.type, from_pandas=True) for f in EDGE_SCHEMA],
+            schema=EDGE_SCHEMA
+        )
+
+def edges_csv(model, handles, hide_zero=False):
+    """Write every edge to CSV bytes in CSV_CHUNK_ROWS-sized chunks.
+
+    Chunks go straight from the edge arrays to Arrow's CSV writer, so no
+    DataFrame or per-row Python formatting is involved. Probabilities are
+    rounded to CSV_DECIMALS places, which keeps rows short.
+    """
+    # Rounded float32 values can still print 8 digits (0.92499995), so the
+    # probabilities are widened to float64 before rounding
+    csv_schema = pa.schema([
+        pa.field(f.name, pa.float64()) if pa.types.is_floating(f.type) else f
+        for f in EDGE_SCHEMA
+    ])
+    buf = io.BytesIO()
+    with pacsv.CSVWriter(buf, csv_schema) as writer:
+        for table in edge_tables(model, handles, hide_zero):
+            writer.write_table(pa.table(
+                [pc.round(col.cast(f.type), CSV_DECIMALS) if pa.types.is_floating(f.type) else col
+                 for col, f in zip(table.columns, csv_schema)],
+                schema=csv_schema
+            ))
+    return buf.getvalue()
+
+def edges_parquet(model, handles, hide_zero=False):
+    """Write every edge to Parquet bytes, one row group per chunk."""
+    buf = io.BytesIO()
+    with pq.ParquetWriter(buf, EDGE_SCHEMA) as writer:
+        for table in edge_tables(model, handles, hide_zero):
+            writer.write_table(table)
+    return buf.getvalue()
+
+def live_personas(model):
+    """Return (live_rows, live_cols): personas that can follow, and be followed by, anyone else.
+
+    p_final(A, B) > 0 needs p_celeb[B] > 0 or a positive scaled faction
+    prob, so this only takes per-faction counts, not the N x N matrix.
+    """
+    fac_ids, sizes = model["fac_ids"], model["sizes"]
+    links = model["scaled_mat"] > 0
+    # Each persona is counted in its own faction; don't let it follow itself
+    followed_by = (sizes @ links)[fac_ids] - np.diag(links)[fac_ids]
+
+    celeb = model["p_celeb"] > 0
+    live_rows = np.flatnonzero(row_edge_counts(model))
+    live_cols = np.flatnonzero((followed_by > 0) | (celeb & (len(fac_ids) > 1)))
+    return live_rows, live_cols
+
+def draw_rows(model, live, live_rows, rngs, keep):
+    """Bernoulli-draw the edges out of `live_rows` into `live`, one tile of rows at a time.
+
+    Each tile's probabilities are computed, drawn against and reduced
+    before the next one, so the N x N p_final matrix never exists. Tile k
+    draws its uniforms from rngs[k].
+    Returns (in_deg, n_edges, src, tgt) for these rows, keeping the first
+    `keep` drawn edges in row-major order.
+    """
+    N = len(model["fac_ids"])
+    in_deg = np.zeros(N, dtype=np.int32)
+    n_edges = 0
+    src_kept, tgt_kept = [], []
+    n_kept = 0
+
+    # Uniforms and the draw mask are written into buffers reused by every tile
+    rows_per_tile = max(1, DRAW_TILE_CELLS // len(live))
+    uniforms = np.empty((min(rows_per_tile, len(live_rows)), len(live)), dtype=np.float32)
+    mask_buf = np.empty(uniforms.shape, dtype=bool)
+
+    for start, rng in zip(range(0, len(live_rows), rows_per_tile), rngs):
+        rows = live_rows[start:start + rows_per_tile]
+        tile = final_probs(model, rows[:, None], live[None, :])
+
+        # No self-follows: zero (A, A) wherever A is also a live target
+        j = np.minimum(np.searchsorted(live, rows), len(live) - 1)
+        is_self = live[j] == rows
+        tile[np.flatnonzero(is_self), j[is_self]] = 0.0
+
+        u = uniforms[:len(rows)]
+        mask = mask_buf[:len(rows)]
+        rng.random(out=u, dtype=np.float32)
+        np.less(u, tile, out=mask)
+        s, t = np.nonzero(mask)
+        s, t = rows[s], live[t]
+        in_deg += np.bincount(t, minlength=N)
+        n_edges += len(t)
+
+        if n_kept < keep:
+            s, t = s[:keep - n_kept], t[:keep - n_kept]
+            src_kept.append(s)
+            tgt_kept.append(t)
+            n_kept += len(s)
+
+    src = np.concatenate(src_kept) if src_kept else np.zeros(0, dtype=np.intp)
+    tgt = np.concatenate(tgt_kept) if tgt_kept else np.zeros(0, dtype=np.intp)
+    return in_deg, n_edges, src, tgt
+
+def draw_edges(model, rng, keep=PREVIEW_ROWS):
+    """Bernoulli-draw every edge, splitting the source rows across worker threads.
+
+    Returns (in_deg, n_edges, src, tgt): the drawn in-degree of every
+    persona, the number of drawn edges and the first `keep` drawn edges in
+    row-major order.
+    """
+    N = len(model["fac_ids"])
+
+    # Sources that follow nobody and targets nobody can follow (no
+    # celebrity pull and no faction link) are skipped, so draws only cover
+    # the live rows and columns.
+    live_rows, live = live_personas(model)
+    if len(live_rows) == 0 or len(live) == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return np.zeros(N, dtype=np.int32), 0, empty, empty
+
+    # Every tile gets its own generator, so a seeded draw doesn't depend on
+    # how many threads run it. Each worker draws a contiguous run of whole
+    # tiles with its own in-degree counts; NumPy releases the GIL inside the
+    # per-tile array work. Runs are summed/concatenated in order.
+    rows_per_tile = max(1, DRAW_TILE_CELLS // len(live))
+    n_tiles = -(-len(live_rows) // rows_per_tile)
+    tile_rngs = rng.spawn(n_tiles)
+    n_runs = min(DRAW_WORKERS, n_tiles)
+    tile_runs = np.array_split(np.arange(n_tiles), n_runs)
+    runs = [live_rows[r[0] * rows_per_tile:(r[-1] + 1) * rows_per_tile] for r in tile_runs]
+    run_rngs = [tile_rngs[r[0]:r[-1] + 1] for r in tile_runs]
+    draw_run = functools.partial(draw_rows, model, live, keep=keep)
+    with ThreadPoolExecutor(max_workers=n_runs) as pool:
+        results = list(pool.map(draw_run, runs, run_rngs))
+
+    in_deg = sum(r[0] for r in results)
+    n_edges = sum(r[1] for r in results)
+    src = np.concatenate([r[2] for r in results])[:keep]
+    tgt = np.concatenate([r[3] for r in results])[:keep]
+    return in_deg, n_edges, src, tgt
 
 def main():
     st.title("Option 2 Extended: Celebrity + Faction + Large-Faction Scaling")
@@ -52,13 +491,21 @@ def main():
     exponent = st.slider("Faction Size Exponent (beta)", 0.0, 1.0, 0.5, 0.05,
                          help="Larger beta => bigger factions get proportionally reduced more strongly.")
     do_random_draw = st.checkbox("Perform random draw to form actual edges?", value=True)
+    seed = st.number_input("Random seed (0 = fresh draw every run)", min_value=0, value=0, step=1,
+                           disabled=not do_random_draw,
+                           help="A fixed seed reproduces the same drawn edges for the same files and "
+                                "slider settings, on any machine.")
+    hide_zero = st.checkbox("Hide zero-probability edges", value=True,
+                            help="Leave pairs with no celebrity pull and no faction link out of the edge table and downloads.")
 
     if faction_file and persona_file:
         # ------------------------------
         # 1) Read the Excel files
         # ------------------------------
-        df_factions = pd.read_excel(faction_file)
-        df_personas = pd.read_excel(persona_file)
+        faction_bytes = faction_file.getvalue()
+        persona_bytes = persona_file.getvalue()
+        df_factions = read_excel_bytes(faction_bytes)
+        df_personas = read_excel_bytes(persona_bytes)
 
         st.subheader("Factions Data Preview")
         st.write(df_factions.head())
@@ -67,189 +514,79 @@ def main():
         st.write(df_personas.head())
 
         # ------------------------------
-        # 2) Parse Factions
+        # 2) Parse Factions + Personas
         # ------------------------------
-        faction_info = {}
-        for _, row in df_factions.iterrows():
-            fac_name = str(row["Faction"]).strip()
-            ign_flag = row.get("Ignore", 0)
-            ignore_bool = (ign_flag == 1)
-
-            # Intra-faction
-            intra_label = str(row.get("IntraFaction Following", "None")).strip()
-            intra_p = PROB_MAP.get(intra_label, 0.0)
-
-            # Cross-faction columns
-            fHigh   = parse_faction_list(row.get("Factions Following", None))
-            fMod    = parse_faction_list(row.get("Factions who may Follow", None))
-            fNever  = parse_faction_list(row.get("Factions who’ll never Follow", None))
-
-            faction_info[fac_name] = {
-                "ignore": ignore_bool,
-                "intra_prob": intra_p,
-                "fHigh": fHigh,
-                "fMod": fMod,
-                "fNever": fNever
-            }
+        handles, names, factions, tw = load_personas(persona_bytes, faction_bytes)
 
-        # ------------------------------
-        # 3) Parse Personas
-        # ------------------------------
-        personas = []
-        for _, row in df_personas.iterrows():
-            handle = str(row["Handle"]).strip()
-            name   = str(row.get("Name", handle))
-            fac    = str(row["Faction"]).strip()
-            tw     = float(row.get("TwFollowers", 0))
-
-            # skip if faction is ignored or not found
-            if fac not in faction_info:
-                continue
-            if faction_info[fac]["ignore"]:
-                continue
-
-            personas.append({
-                "handle": handle,
-                "name": name,
-                "faction": fac,
-                "tw": tw
-            })
-
-        st.write(f"Total personas after ignoring: {len(personas)}")
-        if not personas:
+        N = len(handles)
+        st.write(f"Total personas after ignoring: {N}")
+        if N == 0:
             st.stop()
 
-        # Build quick lookups
-        handle2name = {p["handle"]: p["name"] for p in personas}
-        handle2fac  = {p["handle"]: p["faction"] for p in personas}
-
-        # Group personas by faction, so we know how large each faction is
-        from collections import defaultdict
-        faction_personas = defaultdict(list)
-        for p in personas:
-            faction_personas[p["faction"]].append(p)
-        faction_sizes = {f: len(lst) for f,lst in faction_personas.items()}
-
-        # max TwFollowers
-        max_tw = max(p["tw"] for p in personas) or 1.0
-
-        # ------------------------------
-        # Helper: get base faction prob
-        # ------------------------------
-        def get_faction_prob(fA, fB):
-            """Return the 'base' probability that A's faction follows B's faction, ignoring large-faction scaling."""
-            if fA == fB:
-                # Intra-faction
-                return faction_info[fA]["intra_prob"]
-
-            infoB = faction_info[fB]
-            if fA in infoB["fNever"]:
-                return 0.0
-            elif fA in infoB["fHigh"]:
-                return 0.9
-            elif fA in infoB["fMod"]:
-                return 0.5
-            else:
-                return 0.0
-
         # ------------------------------
-        # 4) Compute final edge probabilities
+        # 3) Compute final edge probabilities
         # Union of celebrity + faction, with scaling for large factions
         # ------------------------------
-        edges_prob = []
-        for A in personas:
-            for B in personas:
-                if A["handle"] == B["handle"]:
-                    continue
-
-                # 1) Celebrity prob
-                p_celeb = alpha * (B["tw"] / max_tw)
-
-                # 2) Base faction prob
-                base_f = get_faction_prob(A["faction"], B["faction"])
-
-                # 3) Scale down if faction A is large
-                fac_size = faction_sizes[A["faction"]]
-                if fac_size > 1 and base_f > 0 and exponent>0:
-                    scale_factor = (fac_size ** exponent)
-                    base_f = base_f / scale_factor
-
-                # 4) Union
-                p_final = 1 - (1 - p_celeb)*(1 - base_f)
-
-                edges_prob.append({
-                    "source": A["handle"],
-                    "target": B["handle"],
-                    "p_celeb": p_celeb,
-                    "p_faction_raw": get_faction_prob(A["faction"], B["faction"]),  # just for debugging
-                    "p_faction_scaled": base_f,
-                    "p_final": p_final
-                })
+        model = edge_model(faction_bytes, persona_bytes, alpha, exponent)
+
+        # Edges are every ordered (source, target) pair except self-follows,
+        # in row-major order. Rows are only gathered for the slice a table or
+        # the CSV actually needs (see offdiag_pairs).
+        n_pairs = N * (N - 1)
 
         # ------------------------------
-        # 5) Display + Random Draw
+        # 4) Display + Random Draw
         # ------------------------------
         if do_random_draw:
-            chosen_edges = []
-            from collections import Counter
-            in_counter = Counter()
+            rng = np.random.default_rng(seed or None)
+            in_deg, n_edges, chosen_src, chosen_tgt = draw_edges(model, rng)
 
-            for e in edges_prob:
-                if random.random() < e["p_final"]:
-                    chosen_edges.append(e)
-                    in_counter[e["target"]] += 1
-
-            st.write(f"Random-draw edges: {len(chosen_edges)}")
+            st.write(f"Random-draw edges: {n_edges}")
 
             # Build an in-degree table
-            in_deg_table = []
-            for p in personas:
-                h = p["handle"]
-                in_deg_table.append({
-                    "handle": h,
-                    "name": handle2name[h],
-                    "faction": handle2fac[h],
-                    "in_degree": in_counter[h]
-                })
-            df_in_deg = pd.DataFrame(in_deg_table).sort_values("in_degree", ascending=False)
+            df_in_deg = degree_table(handles, names, factions, "in_degree", in_deg)
             st.subheader("In-Degree (Actual)")
             st.dataframe(df_in_deg)
 
-            st.write("Showing first 500 edges:")
-            st.dataframe(pd.DataFrame(chosen_edges).head(500))
+            st.write(f"Showing first {len(chosen_src)} edges:")
+            st.dataframe(edges_frame(model, handles, chosen_src, chosen_tgt))
 
         else:
             st.subheader("Probabilistic Edges (No Random Draw)")
-            st.write("Showing first 500 edges:")
-            df_prob = pd.DataFrame(edges_prob)
-            st.dataframe(df_prob.head(500))
-
-            # Expected in-degree
-            in_sum = defaultdict(float)
-            for e in edges_prob:
-                in_sum[e["target"]] += e["p_final"]
-            rows = []
-            for p in personas:
-                h = p["handle"]
-                rows.append({
-                    "handle": h,
-                    "name": handle2name[h],
-                    "faction": handle2fac[h],
-                    "expected_in_degree": in_sum[h]
-                })
-            df_in = pd.DataFrame(rows).sort_values("expected_in_degree", ascending=False)
+            # Page through the edges; each page is gathered on its own, so
+            # a page costs PREVIEW_ROWS rows plus O(N), never O(N^2)
+            n_shown = int(row_edge_counts(model).sum()) if hide_zero else n_pairs
+            if n_shown == 0:
+                st.write("No edges to show.")
+            else:
+                n_pages = -(-n_shown // PREVIEW_ROWS)
+                page = st.number_input("Edges page", min_value=1, max_value=n_pages, value=1, step=1)
+                start = (page - 1) * PREVIEW_ROWS
+                stop = min(start + PREVIEW_ROWS, n_shown)
+                pairs = nonzero_pairs(model, start, stop) if hide_zero else offdiag_pairs(start, stop, N)
+                st.write(f"Showing edges {start + 1}-{stop} of {n_shown}:")
+                st.dataframe(edges_frame(model, handles, *pairs))
+
+            # Expected in-degree: column sums of p_final, in closed form
+            df_in = degree_table(handles, names, factions, "expected_in_degree", expected_in_degree(model))
             st.subheader("Expected In-Degree")
             st.dataframe(df_in)
 
-        # Download option
+        # Download option (the CSV is only built once the button is clicked)
         st.write("### Download all edges probabilities as CSV")
-        csv_data = pd.DataFrame(edges_prob).to_csv(index=False)
         st.download_button(
             "Download Edges CSV",
-            data=csv_data,
+            data=functools.partial(edges_csv, model, handles, hide_zero),
             file_name="edges_prob.csv",
             mime="text/csv"
         )
+        # Same edges, columnar and compressed: far smaller than the CSV
+        st.download_button(
+            "Download Edges Parquet",
+            data=functools.partial(edges_parquet, model, handles, hide_zero),
+            file_name="edges_prob.parquet",
+            mime="application/vnd.apache.parquet"
+        )
 
 if __name__ == "__main__":
     main()